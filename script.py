@@ -1,24 +1,43 @@
 import DaVinciResolveScript as dvr_script
 import subprocess
+import asyncio
 import os
 import time
+import json
+import threading
+import itertools
+import tempfile
+import shutil
+import dbm
+import hashlib
 import concurrent.futures
 import logging
 import signal
 import sys
-from typing import Dict, Set, List, Optional, Tuple, Any
+from collections import OrderedDict
+from typing import Dict, Set, List, Optional, Tuple, Any, Iterable, Callable, NamedTuple
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Optional: without watchdog the main loop only polls
+    Observer = None
+    FileSystemEventHandler = object
 
 # Configuration
 class Config:
     # Processing settings
-    MAX_WORKERS = min(os.cpu_count() or 4, 8)  # Cap at 8 to prevent overload
-    FFMPEG_THREADS = 0  # 0 means auto
-    POLL_INTERVAL = 1.0  # Increased for better system performance
+    PROBE_WORKERS = 16  # ffprobe is bound by process spawn latency, not CPU
+    ENCODE_WORKERS = min(os.cpu_count() or 4, 4)  # Concurrent ffmpeg conversions (disk/CPU bound)
+    FFMPEG_THREADS = max(1, (os.cpu_count() or 4) // ENCODE_WORKERS)  # Split cores between concurrent jobs
+    POLL_INTERVAL_MIN = 0.1  # Poll quickly right after activity (seconds)
+    POLL_INTERVAL_MAX = 5.0  # Back off to this when idle (seconds)
     BATCH_SIZE = 5  # Reduced for more responsive processing
 
     # FFmpeg settings - Try hardware acceleration with fallback
     HWACCEL_OPTIONS = ['cuda', 'vaapi', 'qsv', 'none']  # Priority order
     PRESET = 'medium'  # Better balance of speed vs quality
+    REENCODE_VIDEO = False  # Re-encode video to H.264 (NVENC when CUDA is available) instead of stream-copying
 
     # Output settings
     OUTPUT_DIR = "/home/pater/converter/converted"
@@ -26,7 +45,23 @@ class Config:
 
     # Performance optimizations
     CODEC_CACHE_SIZE = 500  # Reduced cache size
+    CODEC_CACHE_FILE = os.path.join(OUTPUT_DIR, ".codec_cache.json")
+    CODEC_CACHE_SAVE_DELAY = 2.0  # Debounce disk writes of the codec cache (seconds)
+    HWACCEL_CACHE_FILE = os.path.join(OUTPUT_DIR, ".hwaccel_choice.json")  # Re-detected when ffmpeg changes
+    CONVERT_TIMEOUT_MIN = 60  # Minimum time a single conversion may take (seconds)
+    CONVERT_TIMEOUT_FACTOR = 4  # Otherwise allow this many times the clip's duration
+    CONVERT_TIMEOUT_REENCODE_FACTOR = 30  # With REENCODE_VIDEO; libx264 on a share of the cores can run far below realtime
+    CONVERT_TIMEOUT_DEFAULT = 300  # Used when the clip's duration is unknown (seconds)
     SKIP_ALREADY_PROCESSED = True
+    # Files with these extensions can't carry AAC/OPUS audio (stills, PCM/lossless audio,
+    # camera raw, project and sidecar files), so they are never probed
+    SKIP_EXTENSIONS = {
+        '.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif', '.webp', '.heic', '.psd', '.exr', '.dpx', '.dng', '.svg',
+        '.wav', '.aif', '.aiff', '.flac',
+        '.r3d', '.braw', '.ari',
+        '.edl', '.xml', '.fcpxml', '.aaf', '.otio', '.drp', '.drt', '.srt', '.vtt', '.txt', '.csv', '.cube',
+    }
+    PROCESSED_INDEX_FILE = os.path.join(OUTPUT_DIR, ".processed.db")
 
     # Logging
     LOG_LEVEL = logging.INFO
@@ -43,105 +78,457 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class FFmpegHandler:
-    def __init__(self):
-        self.codec_cache: Dict[str, str] = {}
-        self.working_hwaccel = self._detect_hwaccel()
+def _first_stream(probe: Dict[str, Any], codec_type: str) -> Optional[Dict[str, Any]]:
+    """First stream of a type in ffprobe output, ignoring embedded cover art."""
+    for stream in probe.get('streams', []):
+        if stream.get('codec_type') == codec_type and not stream.get('disposition', {}).get('attached_pic'):
+            return stream
+    return None
 
-    def _detect_hwaccel(self) -> str:
-        """Detect working hardware acceleration."""
-        for hwaccel in Config.HWACCEL_OPTIONS:
-            if hwaccel == 'none':
-                logger.info("Using software encoding")
-                return 'none'
+def _probe_media(file_path: str) -> Optional[Dict[str, Any]]:
+    """Probe all streams and the container format in a single ffprobe call.
 
-            try:
-                # Test hardware acceleration
-                test_cmd = ['ffmpeg', '-f', 'lavfi', '-i', 'testsrc=duration=1:size=320x240:rate=1',
-                           '-hwaccel', hwaccel, '-f', 'null', '-']
-                subprocess.run(test_cmd, capture_output=True, check=True, timeout=10)
-                logger.info(f"Using hardware acceleration: {hwaccel}")
-                return hwaccel
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                continue
+    Only the fields this script uses are kept: the first audio and video
+    codec (empty if there is no such stream) and the duration in seconds.
+    Returns None if probing failed.
+    """
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error', '-show_streams', '-show_format',
+            '-of', 'json', file_path
+        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, timeout=5)
 
-        logger.warning("No hardware acceleration available, using software encoding")
-        return 'none'
+        data = json.loads(result.stdout)
 
-    def get_audio_codec(self, file_path: str) -> Optional[str]:
-        """Get audio codec using ffprobe with caching."""
-        if file_path in self.codec_cache:
-            return self.codec_cache[file_path]
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
+        logger.error(f"FFprobe failed for {file_path}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error during codec detection: {e}")
+        return None
 
-        try:
-            result = subprocess.run([
-                'ffprobe', '-v', 'error', '-select_streams', 'a:0',
-                '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', file_path
-            ], capture_output=True, text=True, check=True, timeout=5)
+    audio = _first_stream(data, 'audio')
+    video = _first_stream(data, 'video')
+    try:
+        duration = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):  # Missing or "N/A"
+        duration = None
+
+    return {
+        'audio_codec': audio.get('codec_name', '').lower() if audio else '',
+        'video_codec': video.get('codec_name', '').lower() if video else '',
+        'duration': duration,
+    }
+
+# Cached in place of a probe result when ffprobe fails; never persisted
+_PROBE_FAILED: Dict[str, Any] = {}
+
+class ClipInfo(NamedTuple):
+    """A Media Pool clip and its file metadata, gathered from a single stat call."""
+    path: str
+    stem: str
+    size: int
+    mtime_ns: int
+    clip: Any
+
+    @classmethod
+    def from_clip(cls, file_path: str, clip: Any) -> 'ClipInfo':
+        """Build a record for a clip; raises OSError if the file is missing."""
+        st = os.stat(file_path)
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        return cls(file_path, stem, st.st_size, st.st_mtime_ns, clip)
+
+def _fadvise(file_path: str, advice_name: str):
+    """Best-effort page cache hint for a whole file; a no-op where posix_fadvise is unavailable."""
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, 'posix_fadvise'):
+        return
+
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
-            codec = result.stdout.strip().lower()
+def _prefetch_file(file_path: str):
+    """Ask the kernel to start reading a file ahead of ffmpeg."""
+    _fadvise(file_path, 'POSIX_FADV_WILLNEED')
 
-            # Manage cache size
-            if len(self.codec_cache) >= Config.CODEC_CACHE_SIZE:
-                # Remove oldest entry
-                oldest_key = next(iter(self.codec_cache))
-                del self.codec_cache[oldest_key]
+def _drop_file_cache(file_path: str):
+    """Let the kernel evict a file that won't be read again from the page cache."""
+    _fadvise(file_path, 'POSIX_FADV_DONTNEED')
 
-            self.codec_cache[file_path] = codec
-            return codec
+class FFmpegHandler:
+    def __init__(self):
+        self._cache_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        # Probe results (or _PROBE_FAILED) keyed by path/mtime/size, least recently used first
+        self._probe_cache: 'OrderedDict[str, Dict[str, Any]]' = self._load_codec_cache()
+        self._working_hwaccel: Optional[str] = None
+        self._gpu_compute_caps: Optional[List[float]] = None
+        self._gpu_counter = itertools.count()  # Round-robins conversions across GPUs
+        # Cache keys of files whose conversion was killed for running over budget
+        self._timed_out: Set[str] = set()
+
+    @property
+    def working_hwaccel(self) -> str:
+        """Hardware acceleration method, detected on first use.
+
+        Conversions stream-copy video unless REENCODE_VIDEO is set, so
+        detection is deferred until something actually needs a decoder.
+        """
+        if self._working_hwaccel is None:
+            self._working_hwaccel = self._detect_hwaccel()
+        return self._working_hwaccel
+
+    @staticmethod
+    def _cache_key(file_path: str, mtime_ns: int, size: int) -> str:
+        """Build a cache key that changes whenever the file is modified."""
+        return f"{file_path}:{mtime_ns}:{size}"
+
+    def _load_codec_cache(self) -> 'OrderedDict[str, Dict[str, Any]]':
+        """Load the persisted codec cache, dropping entries for changed or missing files."""
+        try:
+            with open(Config.CODEC_CACHE_FILE, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return OrderedDict()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable codec cache: {e}")
+            return OrderedDict()
+
+        cache = OrderedDict()
+        # Entries are stored oldest first, so the most recently used ones are kept
+        for key, probe in list(stored.items())[-Config.CODEC_CACHE_SIZE:]:
+            if not isinstance(probe, dict) or 'audio_codec' not in probe:  # Written by an older version
+                continue
+            file_path = key.rsplit(':', 2)[0]
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            if self._cache_key(file_path, st.st_mtime_ns, st.st_size) == key:
+                cache[key] = probe
+
+        logger.debug(f"Loaded {len(cache)} cached codecs")
+        return cache
 
-        except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
-            logger.error(f"FFprobe failed for {file_path}: {e}")
+    def _save_codec_cache(self):
+        """Write the codec cache to disk atomically."""
+        with self._cache_lock:
+            snapshot = {key: probe for key, probe in self._probe_cache.items() if probe is not _PROBE_FAILED}
+            self._save_timer = None
+
+        tmp_path = Config.CODEC_CACHE_FILE + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, Config.CODEC_CACHE_FILE)
+        except OSError as e:
+            logger.warning(f"Could not save codec cache: {e}")
+
+    def _schedule_cache_save(self):
+        """Debounce cache writes so a burst of probes results in a single write."""
+        with self._cache_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(Config.CODEC_CACHE_SAVE_DELAY, self._save_codec_cache)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def close(self):
+        """Flush any pending codec cache write."""
+        with self._cache_lock:
+            pending = self._save_timer is not None
+            if pending:
+                self._save_timer.cancel()
+        if pending:
+            self._save_codec_cache()
+
+    def _ffmpeg_key(self) -> Optional[str]:
+        """Identify the ffmpeg binary on PATH, so an upgraded or replaced ffmpeg is re-detected."""
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
             return None
-        except Exception as e:
-            logger.error(f"Unexpected error during codec detection: {e}")
+        try:
+            ffmpeg = os.path.realpath(ffmpeg)
+            st = os.stat(ffmpeg)
+        except OSError:
             return None
+        return self._cache_key(ffmpeg, st.st_mtime_ns, st.st_size)
 
-    def convert_audio(self, file_path: str, output_dir: str) -> Optional[str]:
-        """Convert media file with optimized settings."""
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        new_file = os.path.join(output_dir, f"{base_name}_converted.mov")
+    def _detect_hwaccel(self) -> str:
+        """Detect available hardware acceleration, reusing the result for the same ffmpeg binary."""
+        ffmpeg_key = self._ffmpeg_key()
+        try:
+            with open(Config.HWACCEL_CACHE_FILE, 'r') as f:
+                cached = json.load(f)
+            if (ffmpeg_key is not None and cached.get('ffmpeg') == ffmpeg_key
+                    and cached.get('hwaccel') in Config.HWACCEL_OPTIONS):
+                logger.info(f"Using hardware acceleration: {cached['hwaccel']} (cached)")
+                return cached['hwaccel']
+        except (OSError, ValueError, AttributeError):  # Missing, or written by an older version
+            pass
+
+        hwaccel = 'none'
+        try:
+            result = subprocess.run(['ffmpeg', '-hide_banner', '-hwaccels'],
+                                    capture_output=True, text=True, check=True, timeout=3)
+            # First line is the "Hardware acceleration methods:" header
+            available = {line.strip() for line in result.stdout.splitlines()[1:]}
+            hwaccel = next((h for h in Config.HWACCEL_OPTIONS if h in available), 'none')
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            logger.warning(f"Could not query hardware acceleration: {e}")
+
+        if hwaccel == 'none':
+            logger.info("Using software encoding")
+        else:
+            logger.info(f"Using hardware acceleration: {hwaccel}")
+
+        if ffmpeg_key is not None:
+            try:
+                with open(Config.HWACCEL_CACHE_FILE, 'w') as f:
+                    json.dump({'ffmpeg': ffmpeg_key, 'hwaccel': hwaccel}, f)
+            except OSError as e:
+                logger.debug(f"Could not cache hardware acceleration choice: {e}")
+
+        return hwaccel
 
-        # Skip if output already exists
-        if os.path.exists(new_file):
+    def _get_gpu_compute_caps(self) -> List[float]:
+        """CUDA compute capability of each NVIDIA GPU, queried once via nvidia-smi."""
+        if self._gpu_compute_caps is None:
+            try:
+                result = subprocess.run(
+                    ['nvidia-smi', '--query-gpu=compute_cap', '--format=csv,noheader'],
+                    capture_output=True, text=True, check=True, timeout=5
+                )
+                self._gpu_compute_caps = [float(cap) for cap in result.stdout.split()]
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError) as e:
+                logger.warning(f"Could not query GPU capabilities: {e}")
+                self._gpu_compute_caps = []
+        return self._gpu_compute_caps
+
+    def _video_args(self, info: ClipInfo) -> Tuple[List[str], List[str]]:
+        """Build the (input, output) ffmpeg arguments for the video streams."""
+        if not Config.REENCODE_VIDEO:
+            return [], ['-c:v', 'copy']  # Copy video stream for speed
+
+        # Without nvidia-smi there's no GPU to count or check, so NVENC can't be trusted either
+        caps = self._get_gpu_compute_caps() if self.working_hwaccel == 'cuda' else []
+        if not caps:
+            return [], ['-c:v', 'libx264', '-preset', Config.PRESET]
+
+        # Spread conversions across all GPUs instead of piling them onto device 0
+        device = next(self._gpu_counter) % len(caps) if len(caps) > 1 else None
+        device_cap = caps[device or 0]
+
+        input_args = ['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda']
+        output_args = ['-c:v', 'h264_nvenc']
+        if device is not None:
+            input_args += ['-hwaccel_device', str(device)]
+            output_args += ['-gpu', str(device)]
+
+        # NVDEC only decodes AV1 from Ampere (compute capability 8.0) onwards;
+        # older GPUs decode it on the CPU and still encode with NVENC
+        if self.get_video_codec(info) == 'av1':
+            if device_cap < 8.0:
+                input_args = []
+
+        return input_args, output_args
+
+    def _get_probe(self, info: ClipInfo) -> Optional[Dict[str, Any]]:
+        """Get probe results from the LRU cache, probing on a miss.
+
+        Failures are cached too, so an unreadable file is only probed again
+        once it changes (e.g. when a copy-in finishes) or after a restart.
+        """
+        key = self._cache_key(info.path, info.mtime_ns, info.size)
+        with self._cache_lock:
+            probe = self._probe_cache.get(key)
+            if probe is not None:
+                self._probe_cache.move_to_end(key)
+                return None if probe is _PROBE_FAILED else probe
+
+        probe = _probe_media(info.path)
+        with self._cache_lock:
+            self._probe_cache[key] = _PROBE_FAILED if probe is None else probe
+            while len(self._probe_cache) > Config.CODEC_CACHE_SIZE:
+                self._probe_cache.popitem(last=False)
+        if probe is not None:
+            self._schedule_cache_save()
+        return probe
+
+    def get_audio_codec(self, info: ClipInfo) -> Optional[str]:
+        """Codec of the first audio stream; empty if there is none, None if probing failed."""
+        probe = self._get_probe(info)
+        return probe['audio_codec'] if probe is not None else None
+
+    def get_video_codec(self, info: ClipInfo) -> Optional[str]:
+        """Codec of the first video stream; empty if there is none, None if probing failed."""
+        probe = self._get_probe(info)
+        return probe['video_codec'] if probe is not None else None
+
+    def get_duration(self, info: ClipInfo) -> Optional[float]:
+        """Get the media duration in seconds, if known."""
+        probe = self._get_probe(info)
+        return probe['duration'] if probe is not None else None
+
+    def _conversion_timeout(self, info: ClipInfo) -> float:
+        """Time budget for converting a clip, scaled by its duration."""
+        duration = self.get_duration(info)
+        if duration is None:
+            return Config.CONVERT_TIMEOUT_DEFAULT
+        factor = Config.CONVERT_TIMEOUT_REENCODE_FACTOR if Config.REENCODE_VIDEO else Config.CONVERT_TIMEOUT_FACTOR
+        return max(Config.CONVERT_TIMEOUT_MIN, duration * factor)
+
+    def timed_out(self, info: ClipInfo) -> bool:
+        """Whether converting this version of the file was already killed for running over budget."""
+        return self._cache_key(info.path, info.mtime_ns, info.size) in self._timed_out
+
+    @staticmethod
+    def output_path(info: ClipInfo, output_dir: str) -> str:
+        """Output file for a clip; the path hash keeps same-named sources in different folders apart."""
+        path_hash = hashlib.sha1(info.path.encode('utf-8', 'surrogateescape')).hexdigest()[:8]
+        return os.path.join(output_dir, f"{info.stem}_{path_hash}_converted.mov")
+
+    async def convert_audio(self, info: ClipInfo, output_dir: str, reuse_existing: bool = False) -> Optional[str]:
+        """Convert media file with optimized settings.
+
+        An existing output is only returned as-is when reuse_existing is set,
+        i.e. when the caller knows it was made from this version of the file.
+        """
+        file_path = info.path
+        new_file = self.output_path(info, output_dir)
+
+        if reuse_existing and os.path.exists(new_file):
             logger.debug(f"Output already exists: {new_file}")
             return new_file
 
-        # Build ffmpeg command
-        cmd = ['ffmpeg', '-y']
-
-        # Add hardware acceleration if available
-        if self.working_hwaccel != 'none':
-            cmd.extend(['-hwaccel', self.working_hwaccel])
-
-        # Input and output settings
-        cmd.extend([
-            '-i', file_path,
-            '-threads', str(Config.FFMPEG_THREADS),
-            '-c:v', 'copy',  # Copy video stream for speed
-            '-c:a', 'pcm_s16le',  # Convert audio to PCM
-            '-avoid_negative_ts', 'make_zero',  # Fix potential timing issues
-            new_file
-        ])
+        # ffmpeg writes to a unique temporary file that is renamed into place on success,
+        # so a partial or concurrent conversion never leaves a half-written output behind
+        fd, partial_file = tempfile.mkstemp(dir=output_dir, suffix='.part')
+        os.close(fd)
 
         try:
-            process = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True
+            if Config.REENCODE_VIDEO:
+                # May run ffprobe / nvidia-smi, so keep it off the event loop
+                input_args, video_args = await asyncio.get_running_loop().run_in_executor(
+                    None, self._video_args, info)
+            else:
+                input_args, video_args = self._video_args(info)
+
+            # Build ffmpeg command; only errors are written to stderr
+            cmd = [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostats', '-y',
+                '-filter_threads', '1', '-filter_complex_threads', '1',  # No filtering is done
+                *input_args,
+                '-i', file_path,
+                '-map', '0:V?',  # All video streams, excluding cover art
+                '-map', '0:a?',  # All audio streams
+                '-threads', str(Config.FFMPEG_THREADS),
+                *video_args,
+                '-c:a', 'pcm_s16le',  # Convert audio to PCM
+                '-avoid_negative_ts', 'make_zero',  # Fix potential timing issues
+                '-f', 'mov', partial_file
+            ]
+
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
             )
-            return new_file if os.path.exists(new_file) else None
+            timeout = self._conversion_timeout(info)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+                # Don't leave ffmpeg running (or a partial output behind) when the job is stopped
+                process.kill()
+                await process.wait()
+                if isinstance(e, asyncio.TimeoutError):
+                    # Retrying would most likely be killed again; wait until the file changes
+                    self._timed_out.add(self._cache_key(info.path, info.mtime_ns, info.size))
+                    logger.error(f"FFmpeg exceeded its {timeout:.0f}s budget for {file_path}, killed; "
+                                 f"not retrying until the file changes")
+                    return None
+                raise
+
+            if process.returncode != 0:
+                # Only decode the tail that gets logged
+                error = stderr[-200:].decode('utf-8', 'replace').strip()
+                logger.error(f"FFmpeg failed for {file_path}: ...{error}")
+                return None
+
+            os.replace(partial_file, new_file)
+            return new_file
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"FFmpeg failed for {file_path}: {e.stderr[:200]}...")
-            # Clean up failed conversion
-            if os.path.exists(new_file):
-                os.remove(new_file)
-            return None
         except Exception as e:
             logger.error(f"Unexpected error during conversion: {e}")
             return None
+        finally:
+            # Clean up failed or cancelled conversions
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+
+class _WakeOnChange(FileSystemEventHandler):
+    """Call a wake-up callback whenever a file appears in a watched directory."""
+
+    def __init__(self, wake: Callable[[], None]):
+        super().__init__()
+        self.wake = wake
+
+    def on_created(self, event):
+        self.wake()
+
+    def on_moved(self, event):
+        self.wake()
+
+class DirectoryWatcher:
+    """Wake the main loop on filesystem activity in media directories.
+
+    Requires the optional watchdog package; without it this is a no-op and
+    the main loop relies on its adaptive poll interval alone.
+    """
+
+    def __init__(self, wake: Callable[[], None]):
+        self.observer = None
+        self.watched: Set[str] = set()
+        self.event_handler = _WakeOnChange(wake)
+
+        if Observer is None:
+            logger.info("watchdog not installed, falling back to polling")
+            return
+
+        self.observer = Observer()
+        self.observer.daemon = True
+        self.observer.start()
+
+    def watch(self, directories: Iterable[str]):
+        """Start watching any directories not already watched."""
+        if self.observer is None:
+            return
+
+        for directory in directories:
+            if directory in self.watched:
+                continue
+            try:
+                self.observer.schedule(self.event_handler, directory, recursive=False)
+                self.watched.add(directory)
+            except OSError as e:
+                logger.warning(f"Cannot watch {directory}: {e}")
+
+    def stop(self):
+        """Stop the observer thread."""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+# Clips that couldn't be stat'ed or probed, by path: (clip, (mtime_ns, size) or None if missing)
+UnresolvedClips = Dict[str, Tuple[Any, Optional[Tuple[int, int]]]]
 
 class ResolveMediaHandler:
     def __init__(self):
@@ -149,19 +536,76 @@ class ResolveMediaHandler:
         self.project = None
         self.media_pool = None
         self.root_folder = None
+        # Base names of outputs converted before the processed index existed
         self.processed_files: Set[str] = set()
+        self.media_dirs: Set[str] = set()
+        self._output_dir = os.path.normpath(Config.OUTPUT_DIR)
+        # Fingerprint of the pool as of the last scan that found nothing to convert
+        self._last_pool_fingerprint: Optional[Tuple[int, int]] = None
+        # Offline or unreadable clips, rechecked cheaply while the pool is unchanged
+        self._unresolved: UnresolvedClips = {}
         self.ffmpeg_handler = FFmpegHandler()
+        self.probe_executor = concurrent.futures.ThreadPoolExecutor(max_workers=Config.PROBE_WORKERS)
 
-        # Load already converted files
+        # Maps original file path -> mtime (ns) at the time it was converted
+        self._index_lock = threading.Lock()
+        self.processed_index = dbm.open(Config.PROCESSED_INDEX_FILE, 'c')
+
+        # Legacy outputs are moved into the index as their clips are seen, which may take several runs
         self._load_converted_files()
+        self._remove_partial_outputs()
+
+    def close(self):
+        """Release resources held by the handler."""
+        self.probe_executor.shutdown(wait=True)
+        self.ffmpeg_handler.close()
+        with self._index_lock:
+            self.processed_index.close()
+
+    def _is_indexed(self, info: ClipInfo) -> Optional[bool]:
+        """Whether the index records this version of the file; None if the path isn't indexed."""
+        with self._index_lock:
+            stored = self.processed_index.get(info.path)
+        if stored is None:
+            return None
+        return stored == str(info.mtime_ns).encode()
+
+    def _is_processed(self, info: ClipInfo) -> bool:
+        """Check whether this exact version of a file was already converted."""
+        indexed = self._is_indexed(info)
+        if indexed is not None:
+            return indexed
+
+        if info.stem in self.processed_files:
+            # Converted before the index existed; record it so later edits are noticed
+            self._mark_processed(info)
+            return True
+        return False
+
+    def _mark_processed(self, info: ClipInfo):
+        """Record a successful conversion in the processed index."""
+        with self._index_lock:
+            self.processed_index[info.path] = str(info.mtime_ns)
 
     def _load_converted_files(self):
         """Load list of already converted files to avoid reprocessing."""
         if Config.SKIP_ALREADY_PROCESSED and os.path.exists(Config.OUTPUT_DIR):
-            for file in os.listdir(Config.OUTPUT_DIR):
-                if file.endswith('_converted.mov'):
-                    original_name = file.replace('_converted.mov', '')
-                    self.processed_files.add(original_name)
+            suffix = '_converted.mov'
+            with os.scandir(Config.OUTPUT_DIR) as entries:
+                for entry in entries:
+                    if entry.name.endswith(suffix) and entry.is_file():
+                        self.processed_files.add(entry.name[:-len(suffix)])
+
+    def _remove_partial_outputs(self):
+        """Delete .part files left behind by a run that was killed mid-conversion."""
+        with os.scandir(Config.OUTPUT_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.part') and entry.is_file():
+                    try:
+                        os.remove(entry.path)
+                        logger.debug(f"Removed partial output: {entry.name}")
+                    except OSError as e:
+                        logger.warning(f"Could not remove partial output {entry.name}: {e}")
 
     def initialize(self) -> bool:
         """Initialize connection to DaVinci Resolve."""
@@ -186,43 +630,140 @@ class ResolveMediaHandler:
             logger.error(f"Error initializing Resolve connection: {e}")
             return False
 
-    def get_clips_needing_conversion(self) -> List[Tuple[str, Any]]:
-        """Get clips that need audio conversion."""
+    @staticmethod
+    def _pool_fingerprint(clips: Dict[Any, Any]) -> Tuple[int, int]:
+        """Cheap identity of the pool's contents that avoids GetClipProperty."""
         try:
-            clips = self.root_folder.GetClips()
-            clips_to_convert = []
+            media_ids = [clip.GetMediaId() for clip in clips.values()]
+        except Exception:  # Missing methods surface as TypeError or AttributeError
+            media_ids = None
 
-            for clip in clips.values():
-                file_path = clip.GetClipProperty("File Path")
-                if not file_path or not os.path.exists(file_path):
-                    continue
+        if media_ids is None or None in media_ids:
+            # Resolve versions without GetMediaId; GetClips keys are only positions
+            media_ids = list(clips.keys())
+        return len(media_ids), hash(tuple(sorted(media_ids)))
 
-                base_name = os.path.splitext(os.path.basename(file_path))[0]
-                if base_name in self.processed_files:
-                    continue
-
-                # Check audio codec
-                codec = self.ffmpeg_handler.get_audio_codec(file_path)
-                if codec in ['aac', 'opus']:
-                    clips_to_convert.append((file_path, clip))
+    def get_clips_needing_conversion(self) -> List[Tuple[ClipInfo, str]]:
+        """Get clips that need audio conversion."""
+        try:
+            clips = self.root_folder.GetClips()
 
+            # If the pool hasn't changed since a scan that found no work, only
+            # clips that were offline or unreadable back then need another look
+            fingerprint = self._pool_fingerprint(clips)
+            if fingerprint == self._last_pool_fingerprint:
+                clips = self._changed_unresolved()
+                if not clips:
+                    return []
+                unresolved = {path: entry for path, entry in self._unresolved.items() if path not in clips}
+            else:
+                unresolved = {}
+
+            clips_to_convert, newly_unresolved = self._scan_clips(clips)
+            unresolved.update(newly_unresolved)
+            self._unresolved = unresolved
+
+            # Clips left over from a partial batch must be picked up on the next poll
+            self._last_pool_fingerprint = None if clips_to_convert else fingerprint
             return clips_to_convert
 
         except Exception as e:
             logger.error(f"Error getting clips: {e}")
             return []
 
-    def process_clip(self, file_path: str, clip: Any) -> bool:
-        """Process a single clip."""
+    def _changed_unresolved(self) -> Dict[str, Any]:
+        """Unresolved clips whose file appeared or changed since they were scanned."""
+        changed = {}
+        for path, (clip, signature) in self._unresolved.items():
+            try:
+                st = os.stat(path)
+                current = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                current = None
+            if current != signature:
+                changed[path] = clip
+        return changed
+
+    def _scan_clips(self, clips: Dict[Any, Any]) -> Tuple[List[Tuple[ClipInfo, str]], UnresolvedClips]:
+        """Filter, stat and probe the pool's clips.
+
+        Also returns the clips that couldn't be stat'ed or probed, for
+        _changed_unresolved to watch.
+        """
+        candidates = []
+        unresolved = {}
+
+        for clip in clips.values():
+            file_path = clip.GetClipProperty("File Path")
+            if not file_path:
+                continue
+
+            if os.path.splitext(file_path)[1].lower() in Config.SKIP_EXTENSIONS:
+                continue
+
+            try:
+                info = ClipInfo.from_clip(file_path, clip)
+            except OSError:
+                unresolved[file_path] = (clip, None)  # Offline, or on a volume that isn't mounted yet
+                continue
+
+            # Only this script writes to OUTPUT_DIR; watching it would wake the loop after every conversion
+            media_dir = os.path.dirname(file_path)
+            if os.path.normpath(media_dir) != self._output_dir:
+                self.media_dirs.add(media_dir)
+
+            if Config.SKIP_ALREADY_PROCESSED and self._is_processed(info):
+                continue
+
+            if self.ffmpeg_handler.timed_out(info):
+                continue
+
+            candidates.append(info)
+
+        if not candidates:
+            return [], unresolved
+
+        # Check audio codecs in parallel; probing is dominated by process spawn, not CPU
+        codecs = list(self.probe_executor.map(self.ffmpeg_handler.get_audio_codec, candidates))
+
+        for info, codec in zip(candidates, codecs):
+            if codec is None:  # Unreadable, possibly still being copied in
+                unresolved[info.path] = (info.clip, (info.mtime_ns, info.size))
+
+        clips_to_convert = [
+            (info, codec)
+            for info, codec in zip(candidates, codecs)
+            if codec in ['aac', 'opus']
+        ]
+        return clips_to_convert, unresolved
+
+    def _replace_in_media_pool(self, clip: Any, new_file: str):
+        """Point a Media Pool clip at the converted file.
+
+        ReplaceClip swaps the underlying file in place and keeps the clip's
+        bin, color and markers; older Resolve versions without it (or a
+        failed swap) fall back to deleting and re-importing the clip.
+        """
         try:
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
+            if clip.ReplaceClip(new_file):
+                return
+        except (AttributeError, TypeError):  # Missing methods may come back as None
+            pass
+
+        self.media_pool.DeleteClips([clip])
+        self.media_pool.ImportMedia([new_file])
 
-            # Get codec for logging
-            codec = self.ffmpeg_handler.get_audio_codec(file_path)
+    async def process_clip(self, info: ClipInfo, codec: str) -> bool:
+        """Process a single clip."""
+        file_path = info.path
+        base_name = info.stem
+        try:
             logger.info(f"⏳ Converting {codec.upper()} file: {base_name}")
 
             start_time = time.time()
-            new_file = self.ffmpeg_handler.convert_audio(file_path, Config.OUTPUT_DIR)
+            # Only an output recorded for this exact version of the source can be reused
+            new_file = await self.ffmpeg_handler.convert_audio(
+                info, Config.OUTPUT_DIR, reuse_existing=self._is_indexed(info) is True)
 
             if not new_file:
                 logger.error(f"❌ Conversion failed: {file_path}")
@@ -231,14 +772,15 @@ class ResolveMediaHandler:
             # Replace in media pool if requested
             if Config.REPLACE_IN_MEDIA_POOL:
                 try:
-                    self.media_pool.DeleteClips([clip])
-                    imported_clips = self.media_pool.ImportMedia([new_file])
+                    self._replace_in_media_pool(info.clip, new_file)
                     logger.info(f"🔄 Replaced in media pool: {base_name}")
+                    # Resolve now reads the converted file, so the original is cold
+                    _drop_file_cache(file_path)
                 except Exception as e:
                     logger.warning(f"Could not replace in media pool: {e}")
 
             # Mark as processed
-            self.processed_files.add(base_name)
+            self._mark_processed(info)
 
             duration = time.time() - start_time
             logger.info(f"✅ Converted in {duration:.1f}s: {base_name}")
@@ -248,54 +790,105 @@ class ResolveMediaHandler:
             logger.error(f"Error processing {file_path}: {e}")
             return False
 
-def main():
+async def main_async():
     """Main monitoring loop."""
     handler = ResolveMediaHandler()
     if not handler.initialize():
         logger.error("Failed to initialize. Exiting.")
+        handler.close()
         return
 
     logger.info(f"🔍 Monitoring for AAC and OPUS files...")
     logger.info(f"Output directory: {Config.OUTPUT_DIR}")
-    logger.info(f"Using {Config.MAX_WORKERS} worker threads")
+    logger.info(f"Running up to {Config.ENCODE_WORKERS} conversions at once")
+
+    loop = asyncio.get_running_loop()
+
+    # Set by the directory watcher (or shutdown) to cut the current wait short
+    trigger = asyncio.Event()
+    watcher = DirectoryWatcher(lambda: loop.call_soon_threadsafe(trigger.set))
 
     # Setup graceful shutdown
-    shutdown_event = threading.Event()
-    def signal_handler(sig, frame):
+    shutdown_event = asyncio.Event()
+    batch_task: Optional[asyncio.Future] = None
+    def signal_handler():
         logger.info("\n🛑 Shutting down...")
         shutdown_event.set()
+        trigger.set()
+        # Cancelling kills running ffmpeg processes and removes their partial outputs
+        if batch_task is not None:
+            batch_task.cancel()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, signal_handler)
+        except NotImplementedError:
+            # Windows event loops don't support add_signal_handler
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(signal_handler))
+
+    # Limits how many ffmpeg processes run at once
+    semaphore = asyncio.Semaphore(Config.ENCODE_WORKERS)
+
+    async def process_limited(info: ClipInfo, codec: str) -> bool:
+        # Start reading the input while the job waits for a free slot
+        _prefetch_file(info.path)
+        async with semaphore:
+            return await handler.process_clip(info, codec)
 
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    poll_interval = Config.POLL_INTERVAL_MIN
 
     try:
         while not shutdown_event.is_set():
             clips_to_process = handler.get_clips_needing_conversion()
+            watcher.watch(handler.media_dirs)
 
+            made_progress = False
             if clips_to_process:
                 logger.info(f"Found {len(clips_to_process)} clips to process")
 
-                with concurrent.futures.ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-                    futures = {
-                        executor.submit(handler.process_clip, file_path, clip): file_path
-                        for file_path, clip in clips_to_process[:Config.BATCH_SIZE]
-                    }
+                # Each conversion enforces its own time budget, so the batch has no overall timeout
+                batch = clips_to_process[:Config.BATCH_SIZE]
+                batch_task = asyncio.ensure_future(asyncio.gather(
+                    *(process_limited(info, codec) for info, codec in batch),
+                    return_exceptions=True
+                ))
+                try:
+                    results = await batch_task
+                except asyncio.CancelledError:
+                    if not shutdown_event.is_set():
+                        raise
+                    break
+
+                for (info, _), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Processing failed for {info.path}: {result}")
+
+                made_progress = any(result is True for result in results)
 
-                    for future in concurrent.futures.as_completed(futures, timeout=300):
-                        file_path = futures[future]
-                        try:
-                            future.result()
-                        except Exception as e:
-                            logger.error(f"Processing failed for {file_path}: {e}")
+            # Failing clips are retried on the backed-off interval, not in a tight loop
+            if made_progress:
+                poll_interval = Config.POLL_INTERVAL_MIN
+            else:
+                poll_interval = min(poll_interval * 2, Config.POLL_INTERVAL_MAX)
 
-            # Wait before next check
-            time.sleep(Config.POLL_INTERVAL)
+            # Wait for filesystem activity or the next poll, whichever comes first
+            try:
+                await asyncio.wait_for(trigger.wait(), timeout=poll_interval)
+                trigger.clear()
+                poll_interval = Config.POLL_INTERVAL_MIN
+            except asyncio.TimeoutError:
+                pass
 
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
     finally:
+        watcher.stop()
+        handler.close()
         logger.info("Monitoring stopped")
 
+def main():
+    """Run the monitoring loop until interrupted."""
+    asyncio.run(main_async())
+
 if __name__ == "__main__":
-    import threading
     main()